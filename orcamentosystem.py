@@ -1,23 +1,103 @@
 import os
+import re
+import math
 import sys
-import shutil
+import json
+import hashlib
+import zipfile
+import posixpath
+import threading
+import warnings
+from dataclasses import asdict, dataclass, field, fields
+from functools import lru_cache
 import tkinter as tk
 from tkinter import ttk
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
 from PIL import Image, ImageTk
-from openpyxl import load_workbook
+from openpyxl import LXML, load_workbook
 from openpyxl.utils import range_boundaries
+from openpyxl.utils.cell import coordinate_to_tuple
 
 
 APP_TITLE = "Orçamento System"
 WINDOW_SIZE = "920x520"
 EXCEL_FILE = "interface.xlsx"
 RUNTIME_EXCEL_FILE = "interface_runtime.xlsx"
-LOGO_FILE = "logo.jpg"
+LOGO_FILE = "logo_160.png"
+LOGO_SOURCE_FILE = "logo.jpg"
+LOGO_SIZE = (160, 160)
+LOGO_THUMB_SUFFIX = ".thumb.bin"
+LOGO_META_SUFFIX = ".thumb.meta"
+DROPDOWNS_CACHE_SUFFIX = ".dropdowns.json"
+INPUT_CELLS = {
+    "contribuinte": "B3",
+    "preco": "B4",
+    "quantidade": "B5",
+    "pagamento": "B7",
+    "bandeira": "B8",
+    "parcelas": "B9",
+    "estado": "B10",
+}
+
+# (row, column) of Frete (B6), Default (B14), Total Cliente (B15) and
+# Valor Unitário (I4).
+RESULT_CELLS = ((6, 2), (14, 2), (15, 2), (4, 9))
+_RESULT_MIN_ROW = min(row for row, _ in RESULT_CELLS)
+_RESULT_MAX_ROW = max(row for row, _ in RESULT_CELLS)
+_RESULT_MIN_COL = min(col for _, col in RESULT_CELLS)
+_RESULT_MAX_COL = max(col for _, col in RESULT_CELLS)
+
+_BASE_PATH = getattr(sys, "_MEIPASS", os.path.abspath(os.path.dirname(__file__)))
+# Onefile builds unpack into a fresh _MEIPASS temp dir on every launch, so
+# caches live next to the executable instead.
+_CACHE_DIR = os.path.dirname(sys.executable) if getattr(sys, "frozen", False) else _BASE_PATH
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_CACHED_VALUE_RE = re.compile(r"(<f\b[^>]*?(?:/>|>.*?</f>))\s*(?:<v>.*?</v>|<v\s*/>)", re.S)
+_CELL_XML_RES = {
+    cell: re.compile(r'<c\b(?=[^>]*\br="%s")([^>]*?)(?:/>|>.*?</c>)' % re.escape(cell), re.S)
+    for cell in INPUT_CELLS.values()
+}
+_STYLE_ATTR_RE = re.compile(r'\bs="\d+"')
+
+_BRL_TRANS = str.maketrans({",": ".", ".": ","})
+_FLOAT_TRANS = str.maketrans({",": ".", ".": None})
+
+if not LXML:
+    warnings.warn(
+        "lxml is not installed; openpyxl will parse workbooks with the slower ElementTree backend",
+        RuntimeWarning,
+    )
+
+
+@dataclass(slots=True)
+class Dropdowns:
+    contribuinte: list = field(default_factory=list)
+    pagamento: list = field(default_factory=list)
+    bandeira: list = field(default_factory=list)
+    parcelas: list = field(default_factory=list)
+    estado: list = field(default_factory=list)
+
+
+@lru_cache(maxsize=None)
+def resource_path(relative_path: str) -> str:
+    return os.path.join(_BASE_PATH, relative_path)
 
 
-def resource_path(relative_path: str) -> str:
-    base_path = getattr(sys, "_MEIPASS", os.path.abspath(os.path.dirname(__file__)))
-    return os.path.join(base_path, relative_path)
+def cache_path(name: str) -> str:
+    return os.path.join(_CACHE_DIR, name)
+
+
+def file_cache_key(path: str) -> list:
+    # Onefile builds re-extract bundled files on every launch, which resets
+    # their mtime; key those on content instead.
+    if getattr(sys, "frozen", False):
+        with open(path, "rb") as fh:
+            return [os.path.getsize(path), hashlib.sha1(fh.read()).hexdigest()]
+    return [os.path.getmtime(path), os.path.getsize(path)]
 
 
 def format_brl(value) -> str:
@@ -27,15 +107,14 @@ def format_brl(value) -> str:
         number = float(value)
     except (TypeError, ValueError):
         number = 0.0
-    formatted = f"{number:,.2f}"
-    formatted = formatted.replace(",", "X").replace(".", ",").replace("X", ".")
+    formatted = f"{number:,.2f}".translate(_BRL_TRANS)
     return f"R$ {formatted}"
 
 
 def parse_float(text: str) -> float:
     if text is None:
         return 0.0
-    cleaned = str(text).strip().replace(".", "").replace(",", ".")
+    cleaned = str(text).strip().translate(_FLOAT_TRANS)
     try:
         return float(cleaned)
     except ValueError:
@@ -52,13 +131,6 @@ def parse_int(text: str) -> int:
         return 0
 
 
-def cell_in_sqref(cell: str, sqref) -> bool:
-    for rng in sqref.ranges:
-        if cell in rng:
-            return True
-    return False
-
-
 def normalize_sheet_name(name: str) -> str:
     name = name.strip()
     if name.startswith("'") and name.endswith("'"):
@@ -72,41 +144,107 @@ def values_from_range(ws, cell_range: str):
         min_col, min_row, max_col, max_row = range_boundaries(cell_range)
     except ValueError:
         return values
-    for row in ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col):
-        for cell in row:
-            if cell.value is not None:
-                values.append(str(cell.value))
+    for row in ws.iter_rows(
+        min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True
+    ):
+        values.extend(str(value) for value in row if value is not None)
     return values
 
 
-def get_dropdown_values(ws, cell: str):
+def parse_validation_formula(ws, formula):
+    if not formula:
+        return []
+    formula = str(formula).strip()
+    if formula.startswith("="):
+        formula = formula[1:]
+    if "," in formula and not "!" in formula and not ":" in formula and not formula.startswith("$"):
+        cleaned = formula.strip().strip('"')
+        return [item.strip() for item in cleaned.split(",") if item.strip()]
+    if "!" in formula:
+        sheet_name, cell_range = formula.split("!", 1)
+        sheet_name = normalize_sheet_name(sheet_name)
+        target_ws = ws.parent[sheet_name] if sheet_name in ws.parent.sheetnames else ws
+        return values_from_range(target_ws, cell_range.replace("$", ""))
+    if ":" in formula:
+        return values_from_range(ws, formula.replace("$", ""))
+    cleaned = formula.strip().strip('"')
+    if "," in cleaned:
+        return [item.strip() for item in cleaned.split(",") if item.strip()]
+    return [cleaned] if cleaned else []
+
+
+def build_validation_map(ws, cells) -> dict:
     validations = getattr(ws, "data_validations", None)
     if not validations:
-        return []
+        return {}
+    # Compare each range's bounds with the requested cells instead of
+    # expanding it: a whole-column rule spans a million cells.
+    pending = {cell: coordinate_to_tuple(cell) for cell in cells}
+    cell_to_dv = {}
     for dv in validations.dataValidation:
-        if not cell_in_sqref(cell, dv.sqref):
+        if not pending:
+            break
+        for rng in dv.sqref.ranges:
+            for cell, (row, col) in list(pending.items()):
+                if rng.min_row <= row <= rng.max_row and rng.min_col <= col <= rng.max_col:
+                    # The first validation covering a cell wins.
+                    cell_to_dv[cell] = dv
+                    del pending[cell]
+    parsed = {}
+    validation_map = {}
+    for cell, dv in cell_to_dv.items():
+        if id(dv) not in parsed:
+            parsed[id(dv)] = parse_validation_formula(ws, dv.formula1)
+        validation_map[cell] = parsed[id(dv)]
+    return validation_map
+
+
+def active_sheet_part(zf: zipfile.ZipFile) -> str:
+    # Mirrors openpyxl's wb.active: the sheet at workbookView/@activeTab.
+    workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+    view = workbook.find(f"{_MAIN_NS}bookViews/{_MAIN_NS}workbookView")
+    index = int(view.get("activeTab", 0)) if view is not None else 0
+    sheets = workbook.findall(f"{_MAIN_NS}sheets/{_MAIN_NS}sheet")
+    rel_id = sheets[index].get(f"{_REL_NS}id")
+    rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{_PKG_REL_NS}Relationship"):
+        if rel.get("Id") != rel_id:
             continue
-        formula = dv.formula1
-        if not formula:
-            return []
-        formula = str(formula).strip()
-        if formula.startswith("="):
-            formula = formula[1:]
-        if "," in formula and not "!" in formula and not ":" in formula and not formula.startswith("$"):
-            cleaned = formula.strip().strip('"')
-            return [item.strip() for item in cleaned.split(",") if item.strip()]
-        if "!" in formula:
-            sheet_name, cell_range = formula.split("!", 1)
-            sheet_name = normalize_sheet_name(sheet_name)
-            target_ws = ws.parent[sheet_name] if sheet_name in ws.parent.sheetnames else ws
-            return values_from_range(target_ws, cell_range.replace("$", ""))
-        if ":" in formula:
-            return values_from_range(ws, formula.replace("$", ""))
-        cleaned = formula.strip().strip('"')
-        if "," in cleaned:
-            return [item.strip() for item in cleaned.split(",") if item.strip()]
-        return [cleaned] if cleaned else []
-    return []
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            return target[1:]
+        return posixpath.normpath(posixpath.join("xl", target))
+    raise KeyError(rel_id)
+
+
+def read_active_sheet(path: str):
+    try:
+        with zipfile.ZipFile(path) as zf:
+            part = active_sheet_part(zf)
+            return part, zf.read(part).decode("utf-8")
+    except (OSError, KeyError, IndexError, ValueError, zipfile.BadZipFile, ElementTree.ParseError):
+        return None, None
+
+
+def strip_cached_values(sheet_xml: str) -> str:
+    # openpyxl cannot recalculate, and its save drops cached formula results.
+    # Do the same here so stale template values are never read back.
+    return _CACHED_VALUE_RE.sub(r"\1", sheet_xml)
+
+
+def set_cell_xml(sheet_xml: str, cell: str, value) -> str:
+    match = _CELL_XML_RES[cell].search(sheet_xml)
+    if match is None:
+        raise KeyError(cell)
+    style = _STYLE_ATTR_RE.search(match.group(1))
+    style = f" {style.group(0)}" if style else ""
+    if isinstance(value, str):
+        new_cell = f'<c r="{cell}"{style} t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+    else:
+        if not math.isfinite(value):
+            raise ValueError(f"{cell}: non-finite value {value!r}")
+        new_cell = f'<c r="{cell}"{style}><v>{value!r}</v></c>'
+    return sheet_xml[: match.start()] + new_cell + sheet_xml[match.end() :]
 
 
 class OrcamentoApp:
@@ -119,28 +257,54 @@ class OrcamentoApp:
         self.excel_path = resource_path(EXCEL_FILE)
         self.runtime_excel_path = resource_path(RUNTIME_EXCEL_FILE)
         self.logo_path = resource_path(LOGO_FILE)
+        if not os.path.exists(self.logo_path):
+            self.logo_path = resource_path(LOGO_SOURCE_FILE)
+        self.dropdowns_cache_path = cache_path(EXCEL_FILE + DROPDOWNS_CACHE_SUFFIX)
+
+        self._wb = None
+        self._sheet_part, self._sheet_xml = read_active_sheet(self.excel_path)
+        if self._sheet_xml is not None:
+            self._sheet_xml = strip_cached_values(self._sheet_xml)
+        self.dropdowns = Dropdowns()
+        self._load_dropdowns_cached()
+        self._vista_values = frozenset(v for v in self.dropdowns.pagamento if "vista" in v.lower())
+        self._build_ui()
 
-        self.dropdown_cache = {}
+    def _load_dropdowns_cached(self):
+        try:
+            key = file_cache_key(self.excel_path)
+        except OSError:
+            self.dropdowns = Dropdowns()
+            return
+        try:
+            with open(self.dropdowns_cache_path, encoding="utf-8") as fh:
+                cached = json.load(fh)
+            if cached.get("key") == key:
+                self.dropdowns = Dropdowns(**cached["values"])
+                return
+        except (OSError, ValueError, KeyError, AttributeError, TypeError):
+            pass
         self._load_dropdowns()
-        self._build_ui()
+        try:
+            with open(self.dropdowns_cache_path, "w", encoding="utf-8") as fh:
+                json.dump({"key": key, "values": asdict(self.dropdowns)}, fh)
+        except OSError:
+            pass
 
     def _load_dropdowns(self):
+        # Data validations are not exposed in read_only mode, so this full
+        # parse only runs when the JSON sidecar is missing or stale.
         try:
-            wb = load_workbook(self.excel_path)
+            wb = load_workbook(self.excel_path, data_only=True, keep_links=False)
         except FileNotFoundError:
-            self.dropdown_cache = {}
+            self.dropdowns = Dropdowns()
             return
-        ws = wb.active
-        mapping = {
-            "B3": "contribuinte",
-            "B7": "pagamento",
-            "B8": "bandeira",
-            "B9": "parcelas",
-            "B10": "estado",
-        }
-        for cell, key in mapping.items():
-            self.dropdown_cache[key] = get_dropdown_values(ws, cell)
+        cells = {f.name: INPUT_CELLS[f.name] for f in fields(Dropdowns)}
+        validation_map = build_validation_map(wb.active, list(cells.values()))
         wb.close()
+        self.dropdowns = Dropdowns(
+            **{key: validation_map.get(cell, []) for key, cell in cells.items()}
+        )
 
     def _build_ui(self):
         container = ttk.Frame(self.root, padding=10)
@@ -159,35 +323,39 @@ class OrcamentoApp:
         form_frame = ttk.Frame(left_frame)
         form_frame.pack(fill="both", expand=True, pady=(10, 0))
 
-        self.contribuinte_var = tk.StringVar()
-        self.pagamento_var = tk.StringVar()
-        self.bandeira_var = tk.StringVar()
-        self.parcelas_var = tk.StringVar()
-        self.estado_var = tk.StringVar()
-        self.preco_var = tk.StringVar()
-        self.quantidade_var = tk.StringVar()
+        self.inputs = {key: tk.StringVar() for key in INPUT_CELLS}
 
         self._add_label(form_frame, "Contribuinte", 0)
-        self.contribuinte_combo = self._add_combo(form_frame, self.contribuinte_var, "contribuinte", 0)
+        self.contribuinte_combo = self._add_combo(
+            form_frame, self.inputs["contribuinte"], self.dropdowns.contribuinte, 0
+        )
 
         self._add_label(form_frame, "Preço", 1)
-        self.preco_entry = self._add_entry(form_frame, self.preco_var, 1)
+        self.preco_entry = self._add_entry(form_frame, self.inputs["preco"], 1)
 
         self._add_label(form_frame, "Quantidade", 2)
-        self.quantidade_entry = self._add_entry(form_frame, self.quantidade_var, 2)
+        self.quantidade_entry = self._add_entry(form_frame, self.inputs["quantidade"], 2)
 
         self._add_label(form_frame, "Pagamento", 3)
-        self.pagamento_combo = self._add_combo(form_frame, self.pagamento_var, "pagamento", 3)
+        self.pagamento_combo = self._add_combo(
+            form_frame, self.inputs["pagamento"], self.dropdowns.pagamento, 3
+        )
         self.pagamento_combo.bind("<<ComboboxSelected>>", self._update_pagamento_state)
 
         self._add_label(form_frame, "Bandeira", 4)
-        self.bandeira_combo = self._add_combo(form_frame, self.bandeira_var, "bandeira", 4)
+        self.bandeira_combo = self._add_combo(
+            form_frame, self.inputs["bandeira"], self.dropdowns.bandeira, 4
+        )
 
         self._add_label(form_frame, "Parcelas", 5)
-        self.parcelas_combo = self._add_combo(form_frame, self.parcelas_var, "parcelas", 5)
+        self.parcelas_combo = self._add_combo(
+            form_frame, self.inputs["parcelas"], self.dropdowns.parcelas, 5
+        )
 
         self._add_label(form_frame, "Estado", 6)
-        self.estado_combo = self._add_combo(form_frame, self.estado_var, "estado", 6)
+        self.estado_combo = self._add_combo(
+            form_frame, self.inputs["estado"], self.dropdowns.estado, 6
+        )
 
         button_frame = ttk.Frame(form_frame)
         button_frame.grid(row=7, column=0, columnspan=2, pady=10, sticky="w")
@@ -211,11 +379,59 @@ class OrcamentoApp:
     def _load_logo(self, frame: ttk.Frame):
         if not os.path.exists(self.logo_path):
             return
+        self.logo_label = ttk.Label(frame)
+        self.logo_label.pack(anchor="w")
+        threading.Thread(target=self._decode_logo, daemon=True).start()
+
+    def _decode_logo(self):
+        try:
+            if os.path.basename(self.logo_path) == LOGO_SOURCE_FILE:
+                image = self._load_logo_thumbnail()
+            else:
+                image = Image.open(self.logo_path)
+                image.load()
+        except Exception:
+            return
+        try:
+            self.root.after(0, lambda img=image: self._attach_logo(img))
+        except RuntimeError:
+            pass
+
+    def _load_logo_thumbnail(self):
+        # Only the logo.jpg fallback is cached: a pre-sized logo_160.png
+        # decodes faster than the raw pixel buffer can be read back.
+        logo_name = os.path.basename(self.logo_path)
+        thumb_path = cache_path(logo_name + LOGO_THUMB_SUFFIX)
+        meta_path = cache_path(logo_name + LOGO_META_SUFFIX)
+        key = file_cache_key(self.logo_path)
+        try:
+            with open(meta_path, encoding="utf-8") as fh:
+                meta = json.load(fh)
+            if meta.get("key") == key:
+                with open(thumb_path, "rb") as fh:
+                    return Image.frombytes("RGBA", tuple(meta["size"]), fh.read())
+        except (OSError, ValueError, KeyError, AttributeError, TypeError):
+            pass
+        image = Image.open(self.logo_path)
+        if image.width <= LOGO_SIZE[0] and image.height <= LOGO_SIZE[1]:
+            image.load()
+            return image
+        image.thumbnail(LOGO_SIZE)
+        image = image.convert("RGBA")
+        try:
+            with open(thumb_path, "wb") as fh:
+                fh.write(image.tobytes())
+            with open(meta_path, "w", encoding="utf-8") as fh:
+                json.dump({"key": key, "size": list(image.size)}, fh)
+        except OSError:
+            pass
+        return image
+
+    def _attach_logo(self, image):
+        # PhotoImage talks to Tk, so it has to be built on the main thread.
         try:
-            image = Image.open(self.logo_path)
-            image.thumbnail((160, 160))
             self.logo_image = ImageTk.PhotoImage(image)
-            ttk.Label(frame, image=self.logo_image).pack(anchor="w")
+            self.logo_label.configure(image=self.logo_image)
         except Exception:
             pass
 
@@ -228,9 +444,9 @@ class OrcamentoApp:
         entry.grid(row=row, column=1, sticky="w", pady=4)
         return entry
 
-    def _add_combo(self, frame: ttk.Frame, variable: tk.StringVar, key: str, row: int):
+    @staticmethod
+    def _add_combo(frame: ttk.Frame, variable: tk.StringVar, values: list, row: int):
         combo = ttk.Combobox(frame, textvariable=variable, state="readonly", width=23)
-        values = self.dropdown_cache.get(key, [])
         if values:
             combo["values"] = values
             variable.set(values[0])
@@ -248,8 +464,7 @@ class OrcamentoApp:
         )
 
     def _update_pagamento_state(self, event=None):
-        pagamento = self.pagamento_var.get() or ""
-        if "vista" in pagamento.lower():
+        if self.inputs["pagamento"].get() in self._vista_values:
             self.bandeira_combo.configure(state="disabled")
             self.parcelas_combo.configure(state="disabled")
         else:
@@ -257,33 +472,70 @@ class OrcamentoApp:
             self.parcelas_combo.configure(state="readonly")
 
     def calculate(self):
+        vals = {key: var.get() for key, var in self.inputs.items()}
+        vals["preco"] = parse_float(vals["preco"])
+        vals["quantidade"] = parse_int(vals["quantidade"])
+        if not math.isfinite(vals["preco"]):
+            self._set_results(None, None, None, None)
+            return
+        values = {INPUT_CELLS[key]: value for key, value in vals.items()}
         try:
-            shutil.copyfile(self.excel_path, self.runtime_excel_path)
-            wb = load_workbook(self.runtime_excel_path, data_only=False)
+            self._write_runtime_workbook(values)
         except FileNotFoundError:
             self._set_results(None, None, None, None)
             return
-        ws = wb.active
-        ws["B3"] = self.contribuinte_var.get()
-        ws["B4"] = parse_float(self.preco_var.get())
-        ws["B5"] = parse_int(self.quantidade_var.get())
-        ws["B7"] = self.pagamento_var.get()
-        ws["B8"] = self.bandeira_var.get()
-        ws["B9"] = self.parcelas_var.get()
-        ws["B10"] = self.estado_var.get()
-        wb.save(self.runtime_excel_path)
-        wb.close()
 
-        wb_result = load_workbook(self.runtime_excel_path, data_only=True)
+        wb_result = load_workbook(
+            self.runtime_excel_path, data_only=True, read_only=True, keep_links=False
+        )
         ws_result = wb_result.active
-        frete = ws_result["B6"].value
-        default_val = ws_result["B14"].value
-        total_cliente = ws_result["B15"].value
-        valor_unit = ws_result["I4"].value
+        # Random cell access re-scans the sheet in read_only mode, so stream
+        # the block spanning RESULT_CELLS once and pick the values from it.
+        rows = list(
+            ws_result.iter_rows(
+                min_row=_RESULT_MIN_ROW,
+                max_row=_RESULT_MAX_ROW,
+                min_col=_RESULT_MIN_COL,
+                max_col=_RESULT_MAX_COL,
+                values_only=True,
+            )
+        )
         wb_result.close()
+        width = _RESULT_MAX_COL - _RESULT_MIN_COL + 1
+        rows += [(None,) * width] * (_RESULT_MAX_ROW - _RESULT_MIN_ROW + 1 - len(rows))
+        frete, default_val, total_cliente, valor_unit = (
+            rows[row - _RESULT_MIN_ROW][col - _RESULT_MIN_COL] for row, col in RESULT_CELLS
+        )
 
         self._set_results(frete, default_val, total_cliente, valor_unit)
 
+    def _write_runtime_workbook(self, values: dict):
+        sheet_xml = self._sheet_xml
+        if sheet_xml is not None:
+            try:
+                for cell, value in values.items():
+                    sheet_xml = set_cell_xml(sheet_xml, cell, value)
+            except KeyError:
+                sheet_xml = None
+        if sheet_xml is None:
+            # The active sheet could not be located in the template, or it
+            # has no XML for one of the input cells, so let openpyxl do it.
+            if self._wb is None:
+                self._wb = load_workbook(self.excel_path, data_only=False)
+            ws = self._wb.active
+            for cell, value in values.items():
+                ws[cell] = value
+            self._wb.save(self.runtime_excel_path)
+            return
+        with zipfile.ZipFile(self.excel_path) as src, zipfile.ZipFile(
+            self.runtime_excel_path, "w", zipfile.ZIP_DEFLATED
+        ) as dst:
+            for item in src.infolist():
+                if item.filename == self._sheet_part:
+                    dst.writestr(item, sheet_xml.encode("utf-8"))
+                else:
+                    dst.writestr(item, src.read(item))
+
     def _set_results(self, frete, default_val, total_cliente, valor_unit):
         self.frete_var.set(format_brl(frete))
         self.default_var.set(format_brl(default_val))
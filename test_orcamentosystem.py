@@ -0,0 +1,149 @@
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from orcamentosystem import (
+    active_sheet_part,
+    build_validation_map,
+    read_active_sheet,
+    set_cell_xml,
+    strip_cached_values,
+)
+
+
+WORKBOOK_XML = (
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    "{views}"
+    '<sheets><sheet name="Dados" sheetId="1" r:id="rId1"/>'
+    '<sheet name="Orcamento" sheetId="2" r:id="rId2"/></sheets>'
+    "</workbook>"
+)
+RELS_XML = (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Target="{target}"/>'
+    "</Relationships>"
+)
+
+
+def make_workbook(path, views="", target="worksheets/sheet2.xml"):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("xl/workbook.xml", WORKBOOK_XML.format(views=views))
+        zf.writestr("xl/_rels/workbook.xml.rels", RELS_XML.format(target=target))
+        zf.writestr("xl/worksheets/sheet1.xml", "<worksheet>dados</worksheet>")
+        zf.writestr("xl/worksheets/sheet2.xml", "<worksheet>orcamento</worksheet>")
+    return zipfile.ZipFile(path)
+
+
+def test_set_cell_xml_replaces_self_closing_cell():
+    sheet = '<row r="4"><c r="B4" s="7"/></row>'
+    assert set_cell_xml(sheet, "B4", 12.5) == '<row r="4"><c r="B4" s="7"><v>12.5</v></c></row>'
+
+
+def test_set_cell_xml_replaces_cell_with_content():
+    sheet = '<row r="3"><c r="B3" s="4" t="s"><v>1</v></c></row>'
+    result = set_cell_xml(sheet, "B3", "Sim")
+    assert result == '<row r="3"><c r="B3" s="4" t="inlineStr"><is><t>Sim</t></is></c></row>'
+
+
+def test_set_cell_xml_does_not_match_longer_address():
+    sheet = '<c r="B30" s="2"><v>9</v></c><c r="B3"><v>1</v></c>'
+    result = set_cell_xml(sheet, "B3", 5)
+    assert result == '<c r="B30" s="2"><v>9</v></c><c r="B3"><v>5</v></c>'
+
+
+def test_set_cell_xml_without_style():
+    assert set_cell_xml('<c r="B5"/>', "B5", 3) == '<c r="B5"><v>3</v></c>'
+
+
+def test_set_cell_xml_escapes_text():
+    result = set_cell_xml('<c r="B10" s="1"/>', "B10", "A&B <SP>")
+    assert result == '<c r="B10" s="1" t="inlineStr"><is><t>A&amp;B &lt;SP&gt;</t></is></c>'
+
+
+def test_set_cell_xml_missing_cell():
+    with pytest.raises(KeyError):
+        set_cell_xml('<c r="B30"/>', "B3", "x")
+
+
+@pytest.mark.parametrize("value", [float("inf"), float("-inf"), float("nan")])
+def test_set_cell_xml_rejects_non_finite(value):
+    with pytest.raises(ValueError):
+        set_cell_xml('<c r="B4"/>', "B4", value)
+
+
+def test_strip_cached_values():
+    sheet = (
+        '<c r="B6" s="3"><f>B4*0.2</f><v>20</v></c>'
+        '<c r="B14"><f t="shared" si="0"/><v>5</v></c>'
+        '<c r="B15"><f>B14+B6</f><v/></c>'
+        '<c r="B7" t="s"><v>2</v></c>'
+    )
+    assert strip_cached_values(sheet) == (
+        '<c r="B6" s="3"><f>B4*0.2</f></c>'
+        '<c r="B14"><f t="shared" si="0"/></c>'
+        '<c r="B15"><f>B14+B6</f></c>'
+        '<c r="B7" t="s"><v>2</v></c>'
+    )
+
+
+def test_active_sheet_part_defaults_to_first_sheet(tmp_path):
+    with make_workbook(tmp_path / "t.xlsx") as zf:
+        assert active_sheet_part(zf) == "xl/worksheets/sheet1.xml"
+
+
+def test_active_sheet_part_relative_target(tmp_path):
+    views = '<bookViews><workbookView activeTab="1"/></bookViews>'
+    with make_workbook(tmp_path / "t.xlsx", views=views) as zf:
+        assert active_sheet_part(zf) == "xl/worksheets/sheet2.xml"
+
+
+def test_active_sheet_part_absolute_target(tmp_path):
+    views = '<bookViews><workbookView activeTab="1"/></bookViews>'
+    with make_workbook(tmp_path / "t.xlsx", views=views, target="/xl/worksheets/sheet2.xml") as zf:
+        assert active_sheet_part(zf) == "xl/worksheets/sheet2.xml"
+
+
+def test_read_active_sheet(tmp_path):
+    views = '<bookViews><workbookView activeTab="1"/></bookViews>'
+    make_workbook(tmp_path / "t.xlsx", views=views).close()
+    assert read_active_sheet(str(tmp_path / "t.xlsx")) == (
+        "xl/worksheets/sheet2.xml",
+        "<worksheet>orcamento</worksheet>",
+    )
+
+
+def test_read_active_sheet_missing_file(tmp_path):
+    assert read_active_sheet(str(tmp_path / "missing.xlsx")) == (None, None)
+
+
+def add_validation(ws, formula, sqref):
+    dv = DataValidation(type="list", formula1=formula)
+    dv.add(sqref)
+    ws.add_data_validation(dv)
+
+
+def test_build_validation_map():
+    wb = Workbook()
+    ws = wb.active
+    lists = wb.create_sheet("Listas")
+    for row, estado in enumerate(["SP", "RJ", "MG"], start=1):
+        lists.cell(row=row, column=1, value=estado)
+    add_validation(ws, '"Sim,Não"', "B3")
+    add_validation(ws, "Listas!$A$1:$A$3", "B10")
+    add_validation(ws, '"Outro"', "B3:B5")
+    assert build_validation_map(ws, ["B3", "B7", "B10"]) == {
+        "B3": ["Sim", "Não"],
+        "B10": ["SP", "RJ", "MG"],
+    }
+
+
+def test_build_validation_map_whole_column():
+    wb = Workbook()
+    ws = wb.active
+    add_validation(ws, '"A,B"', "C1:C1048576")
+    add_validation(ws, '"PIX,À vista"', "B7")
+    assert build_validation_map(ws, ["B7", "C9"]) == {"B7": ["PIX", "À vista"], "C9": ["A", "B"]}